@@ -0,0 +1,397 @@
+import asyncio
+import logging
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import List, Dict, Any
+
+from dotenv import load_dotenv
+from livekit.agents import (
+    Agent,
+    AgentSession,
+    JobContext,
+    JobProcess,
+    MetricsCollectedEvent,
+    RoomInputOptions,
+    WorkerOptions,
+    cli,
+    metrics,
+    tokenize,
+    function_tool,
+    RunContext
+)
+from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
+from livekit.plugins.turn_detector.multilingual import MultilingualModel
+
+logger = logging.getLogger("agent")
+
+load_dotenv(".env.local")
+
+# Stateless sentence splitter for TTS, shared by every session (each stream gets its own state).
+# A sentence is still only emitted once the next one starts; stream_context_len=1 just
+# stops the stream from buffering 10 characters before it first tries to split.
+SENTENCE_TOKENIZER = tokenize.basic.SentenceTokenizer(
+    min_sentence_len=1, stream_context_len=1
+)
+
+WELLNESS_LOG_FILE = "wellness_log.jsonl"
+# Block size for reading the log backwards when only the latest entries are needed
+TAIL_READ_SIZE = 64 * 1024
+
+# Shared compact encoder; encode() takes the C fast path without building an encoder per call
+_ENTRY_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+# Reply spoken after a check-in is saved, filled with str.format_map
+_CHECKIN_TEMPLATE = """Check-in saved successfully!
+
+Today's Summary:
+• Mood: {mood}
+• Energy: {energy}
+• On your mind: {stress}
+• Your objectives:
+{objs}
+
+{summary}
+
+I'm here whenever you need to check in. Take care!"""
+
+@dataclass(slots=True)
+class SessionState:
+    """Check-in state for a single session, so concurrent jobs in one worker don't interfere"""
+    mood: str | None = None
+    energy: str | None = None
+    stress_factors: List[str] = field(default_factory=list)
+    objectives: List[str] = field(default_factory=list)
+    timestamp: str | None = None
+    summary: str | None = None
+
+def _parse_records(lines) -> List[Dict[str, Any]]:
+    """Parse JSON Lines records, skipping blank or corrupt lines"""
+    records = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError as e:
+            logger.warning("Skipping corrupt wellness log line: %s", e)
+    return records
+
+def save_wellness_entry(entry: Dict[str, Any]):
+    """Append a wellness check-in entry to the JSON Lines log"""
+    line = (_ENTRY_ENCODER.encode(entry) + "\n").encode()
+    with open(WELLNESS_LOG_FILE, "a+b") as f:
+        # A crash mid-write can leave a torn last line; start on a fresh line
+        # so this entry isn't glued onto it
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.write(line)
+    
+    logger.info("Saved wellness entry: %s", entry["timestamp"])
+
+def load_last_n(n: int) -> List[Dict[str, Any]]:
+    """Load the n most recent check-ins, reading the log backwards from the end"""
+    if n <= 0 or not os.path.exists(WELLNESS_LOG_FILE):
+        return []
+    
+    try:
+        records = []
+        with open(WELLNESS_LOG_FILE, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            partial = b""
+            # Read backwards in blocks, parsing as we go, until n records have parsed
+            while end > 0 and len(records) < n:
+                start = max(0, end - TAIL_READ_SIZE)
+                f.seek(start)
+                lines = (f.read(end - start) + partial).split(b"\n")
+                end = start
+                # Stopped mid-file, so the first line may be a partial record;
+                # carry it over to the next block
+                partial = lines.pop(0) if end > 0 else b""
+                records[:0] = _parse_records(lines)
+        
+        return records[-n:]
+    except Exception as e:
+        logger.error("Error loading wellness history: %s", e)
+        return []
+
+def get_last_checkin() -> Dict[str, Any] | None:
+    """Get the most recent check-in, reading only the end of the log"""
+    last = load_last_n(1)
+    return last[0] if last else None
+
+def format_history_context() -> str:
+    """Format previous check-ins for context"""
+    last = get_last_checkin()
+    if not last:
+        return "This is your first check-in with me."
+    
+    last_date = last.get('timestamp', 'last time')
+    last_mood = last.get('mood', 'not specified')
+    last_objectives = last.get('objectives', [])
+    
+    context = f"Last check-in was on {last_date}. You mentioned feeling {last_mood}"
+    if last_objectives:
+        context += f" and wanted to work on: {', '.join(last_objectives[:2])}"
+    
+    return context
+
+
+_WELLNESS_INSTRUCTIONS_TEMPLATE = """You are a supportive Health & Wellness Voice Companion. Your role is to conduct brief daily check-ins with users to support their wellbeing.
+
+IMPORTANT CONTEXT:
+%(history_context)s
+
+YOUR APPROACH:
+- You are warm, empathetic, and grounded
+- You ask open-ended questions and listen actively
+- You NEVER diagnose, prescribe, or give medical advice
+- You offer small, actionable suggestions only
+- You keep responses concise for voice interaction
+
+CHECK-IN FLOW:
+1. Greet warmly and reference previous check-in if available
+2. Ask about mood and energy (one question at a time)
+3. Gently explore any stress factors
+4. Ask about 1-3 intentions/objectives for the day
+5. Offer ONE small, practical suggestion based on what they shared
+6. Summarize their mood and objectives
+7. Use the save_checkin tool to persist the conversation
+
+EXAMPLE QUESTIONS:
+- "How are you feeling today?"
+- "What's your energy like right now?"
+- "Is anything weighing on your mind?"
+- "What would you like to accomplish today?"
+- "What's one thing you want to do for yourself today?"
+
+ADVICE STYLE (keep it simple):
+- Break big goals into smaller steps
+- Suggest short breaks or walks
+- Encourage self-compassion
+- Remind them to stay hydrated
+- Simple grounding techniques (deep breaths, stretching)
+
+REMEMBER:
+- One question at a time
+- No medical claims
+- Stay supportive, never judgmental
+- Keep it conversational and natural
+- No emojis or special formatting in voice responses
+- Use tools to track mood, objectives, and save the check-in"""
+
+
+class WellnessCompanion(Agent):
+    def __init__(self, history_context: str | None = None) -> None:
+        if history_context is None:
+            history_context = format_history_context()
+        
+        super().__init__(
+            instructions=_WELLNESS_INSTRUCTIONS_TEMPLATE % {"history_context": history_context},
+        )
+        self.state = SessionState()
+
+    def reset_session(self):
+        """Reset current session state"""
+        self.state = SessionState()
+
+    @function_tool
+    async def record_mood(
+        self,
+        context: RunContext,
+        mood_description: str,
+        energy_level: str = "not specified"
+    ):
+        """Record the user's current mood and energy level.
+        
+        Args:
+            mood_description: How the user describes their mood (e.g., "good", "tired", "stressed", "energized")
+            energy_level: User's energy level (e.g., "high", "medium", "low", "exhausted")
+        """
+        self.state.mood = mood_description
+        self.state.energy = energy_level
+        
+        logger.info("Recorded mood: %s, energy: %s", mood_description, energy_level)
+        return f"Noted: Mood is {mood_description}, energy level is {energy_level}"
+
+    @function_tool
+    async def record_stress_factor(
+        self,
+        context: RunContext,
+        stress_factor: str
+    ):
+        """Record something that's stressing the user or on their mind.
+        
+        Args:
+            stress_factor: What's causing stress or concern
+        """
+        self.state.stress_factors.append(stress_factor)
+        
+        logger.info("Recorded stress factor: %s", stress_factor)
+        return f"I hear you - {stress_factor} is on your mind"
+
+    @function_tool
+    async def record_objective(
+        self,
+        context: RunContext,
+        objective: str
+    ):
+        """Record a goal or intention the user has for the day.
+        
+        Args:
+            objective: What the user wants to accomplish or focus on today
+        """
+        self.state.objectives.append(objective)
+        
+        logger.info("Recorded objective: %s", objective)
+        return f"Added to your objectives: {objective}"
+
+    @function_tool
+    async def save_checkin(
+        self,
+        context: RunContext,
+        summary: str
+    ):
+        """Save the complete check-in to the wellness log.
+        
+        Args:
+            summary: A brief one-sentence summary of the check-in
+        """
+        state = self.state
+        
+        if not state.mood:
+            return "Cannot save check-in yet - mood hasn't been recorded"
+        
+        if not state.objectives:
+            return "Cannot save check-in yet - no objectives recorded"
+        
+        state.summary = summary
+        state.timestamp = datetime.now(timezone.utc).isoformat()
+        
+        # Tool calls from one LLM turn run concurrently, so start the next session
+        # before awaiting the write; other tools then can't change this check-in mid-save
+        self.reset_session()
+        
+        # Save to file without blocking the audio pipeline
+        try:
+            await asyncio.to_thread(save_wellness_entry, asdict(state))
+        except Exception as e:
+            logger.error("Error saving wellness entry: %s", e)
+            # Put the check-in back unless another tool already started a new one
+            if self.state == SessionState():
+                self.state = state
+            return "Sorry, I couldn't save your check-in right now. Please try again in a moment."
+        
+        # Format response
+        return _CHECKIN_TEMPLATE.format_map({
+            "mood": state.mood,
+            "energy": state.energy,
+            "stress": ", ".join(state.stress_factors) if state.stress_factors else "nothing specific",
+            "objs": "\n".join([f"  • {obj}" for obj in state.objectives]),
+            "summary": summary,
+        })
+
+    @function_tool
+    async def review_recent_checkins(
+        self,
+        context: RunContext,
+        days: int = 7
+    ):
+        """Review recent check-ins to provide insights.
+        
+        Args:
+            days: Number of recent days to review (default: 7)
+        """
+        # Only parse the entries being reviewed, not the whole log
+        recent = await asyncio.to_thread(load_last_n, max(days, 1))
+        
+        if not recent:
+            return "No previous check-ins found yet."
+        
+        # Simple analysis
+        moods = [entry.get('mood', 'unknown') for entry in recent]
+        total_objectives = sum(len(entry.get('objectives', [])) for entry in recent)
+        
+        response = f"""Here's a look at your last {len(recent)} check-in(s):
+
+Recent moods: {', '.join(moods[-5:])}
+Total objectives set: {total_objectives}
+Check-ins completed: {len(recent)}
+
+"""
+        
+        if len(recent) >= 3:
+            response += "You've been consistent with checking in - that's great for self-awareness!"
+        
+        return response
+
+
+def prewarm(proc: JobProcess):
+    proc.userdata["vad"] = silero.VAD.load()
+
+
+def get_turn_detector(proc: JobProcess) -> MultilingualModel:
+    """Get the turn detector shared by all jobs in this worker process"""
+    # MultilingualModel needs a running job context for its inference executor,
+    # so it can't be built in prewarm - the first job creates it instead
+    turn_detector = proc.userdata.get("turn_detector")
+    if turn_detector is None:
+        turn_detector = proc.userdata["turn_detector"] = MultilingualModel()
+    return turn_detector
+
+
+async def entrypoint(ctx: JobContext):
+    ctx.log_context_fields = {
+        "room": ctx.room.name,
+    }
+
+    # Read the previous check-in off the event loop
+    history_context = await asyncio.to_thread(format_history_context)
+
+    session = AgentSession(
+        stt=deepgram.STT(model="nova-3"),
+        llm=google.LLM(model="gemini-2.5-flash"),
+        tts=murf.TTS(
+            voice="en-US-matthew", 
+            style="Conversation",
+            tokenizer=SENTENCE_TOKENIZER,
+            text_pacing=True
+        ),
+        turn_detection=get_turn_detector(ctx.proc),
+        vad=ctx.proc.userdata["vad"],
+        preemptive_generation=True,
+    )
+
+    usage_collector = metrics.UsageCollector()
+    metrics_log_tasks: set[asyncio.Task] = set()
+
+    @session.on("metrics_collected")
+    def _on_metrics_collected(ev: MetricsCollectedEvent):
+        usage_collector.collect(ev.metrics)
+        # Log from a worker thread so the handler returns to the audio loop immediately
+        task = asyncio.create_task(asyncio.to_thread(metrics.log_metrics, ev.metrics))
+        metrics_log_tasks.add(task)
+        task.add_done_callback(metrics_log_tasks.discard)
+
+    async def log_usage():
+        summary = usage_collector.get_summary()
+        logger.info("Usage: %s", summary)
+
+    ctx.add_shutdown_callback(log_usage)
+
+    await session.start(
+        agent=WellnessCompanion(history_context),
+        room=ctx.room,
+        room_input_options=RoomInputOptions(
+            noise_cancellation=noise_cancellation.BVC(),
+        ),
+    )
+
+    await ctx.connect()
+
+
+if __name__ == "__main__":
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
\ No newline at end of file
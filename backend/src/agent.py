@@ -1,6 +1,9 @@
+import asyncio
 import logging
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import List, Dict, Any
 
 from dotenv import load_dotenv
@@ -16,6 +19,7 @@ from livekit.agents import (
     metrics,
     tokenize,
     function_tool,
+    inference,
     RunContext
 )
 from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
@@ -25,68 +29,140 @@ logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
 
+# Stateless sentence splitter for TTS, shared by every session (each stream gets its own state).
+# A sentence is still only emitted once the next one starts; stream_context_len=1 just
+# stops the stream from buffering 10 characters before it first tries to split.
+SENTENCE_TOKENIZER = tokenize.basic.SentenceTokenizer(
+    min_sentence_len=1, stream_context_len=1
+)
+
 CONTENT_FILE = "shared-data/day4_tutor_content.json"
 
-# Global session state
-session_state = {
-    "current_mode": "coordinator",
-    "current_concept": None,
-    "concepts": [],
-    "session": None
+# Fields every concept needs for lookups, topic listings and mode responses
+REQUIRED_CONCEPT_FIELDS = ("id", "title", "summary", "sample_question")
+
+# Route STT and LLM through LiveKit Inference (one LiveKit Cloud connection instead of
+# separate Deepgram and Google ones); needs a LiveKit Cloud project, so it is opt-in
+USE_LIVEKIT_INFERENCE = os.getenv("USE_LIVEKIT_INFERENCE", "").lower() in ("1", "true", "yes")
+
+# Voice used for each learning mode
+MODE_VOICES = {
+    "coordinator": "en-US-matthew",
+    "learn": "en-US-matthew",
+    "quiz": "en-US-alicia",
+    "teach_back": "en-US-ken",
 }
 
-def load_tutor_content() -> List[Dict[str, Any]]:
-    """Load tutor content from JSON file"""
+# What the agent says when switching into each mode, filled from a concept's fields
+MODE_RESPONSE_TEMPLATES = {
+    "learn": """Let me teach you about {title}.
+
+{summary}
+
+Do you have any questions about this? Or would you like to hear more examples?""",
+    "quiz": """Ready to test your knowledge on {title}?
+
+Here's your question: {sample_question}
+
+Take your time!""",
+    "teach_back": """Excellent! Now it's your turn to be the teacher.
+
+Explain {title} to me as if I know nothing about it. Take your time and teach me everything you know!""",
+}
+
+@dataclass(slots=True)
+class SessionState:
+    """Per-session tutor state, so concurrent jobs in one worker don't interfere"""
+    current_mode: str = "coordinator"
+    current_concept: Dict[str, Any] | None = None
+
+def _read_tutor_content() -> List[Dict[str, Any]]:
+    """Read tutor concepts from the JSON content file"""
     if not os.path.exists(CONTENT_FILE):
-        logger.error(f"Content file not found: {CONTENT_FILE}")
+        logger.error("Content file not found: %s", CONTENT_FILE)
         return []
     
     try:
         with open(CONTENT_FILE, "r") as f:
             content = json.load(f)
-            logger.info(f"Loaded {len(content)} concepts from {CONTENT_FILE}")
-            return content
+        
+        # Drop malformed concepts here so one bad entry can't break pre-rendering
+        concepts = []
+        for concept in content:
+            if isinstance(concept, dict) and all(
+                isinstance(concept.get(field), str) for field in REQUIRED_CONCEPT_FIELDS
+            ):
+                concepts.append(concept)
+            else:
+                concept_id = concept.get("id") if isinstance(concept, dict) else concept
+                logger.warning("Skipping malformed concept in %s: %r", CONTENT_FILE, concept_id)
+        
+        logger.info("Loaded %d concepts from %s", len(concepts), CONTENT_FILE)
+        return concepts
     except Exception as e:
-        logger.error(f"Error loading content: {e}")
+        logger.error("Error loading content: %s", e)
         return []
 
-def get_concept_by_id(concept_id: str) -> Dict[str, Any] | None:
-    """Get a concept by ID"""
-    concepts = session_state.get("concepts", [])
-    for concept in concepts:
-        if concept["id"].lower() == concept_id.lower():
-            return concept
-    return None
-
-def get_concept_by_title(title: str) -> Dict[str, Any] | None:
-    """Get a concept by title"""
-    concepts = session_state.get("concepts", [])
-    for concept in concepts:
-        if concept["title"].lower() == title.lower():
-            return concept
-    return None
-
-def get_available_concepts() -> str:
-    """Get formatted list of available concepts"""
-    concepts = session_state.get("concepts", [])
+def format_topic_listings(concepts: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Pre-format the topic listings used by prompts and tools (concepts never change once loaded)"""
     if not concepts:
-        return "No concepts loaded"
+        return {
+            "available_concepts_str": "No concepts loaded",
+            "topics_str": "No topics available",
+        }
     
-    concept_list = [c["title"] for c in concepts]
-    return f"Available topics: {', '.join(concept_list)}"
+    return {
+        "available_concepts_str": "Available topics: " + ", ".join(c["title"] for c in concepts),
+        "topics_str": "Available topics:\n" + "\n".join(
+            f"• {c['title']} - {c['summary'][:50]}..." for c in concepts
+        ),
+    }
 
+def render_mode_responses(concepts: List[Dict[str, Any]]) -> Dict[str, Dict[str, str]]:
+    """Pre-render every concept's mode-switch responses, keyed by concept ID then mode"""
+    return {
+        c["id"]: {mode: template.format_map(c) for mode, template in MODE_RESPONSE_TEMPLATES.items()}
+        for c in concepts
+    }
 
-class UnifiedTutorAgent(Agent):
-    """Unified agent that handles all three modes with voice switching"""
+# Tutor content bundle, cached per process once the content file has loaded
+_tutor_content = None
+
+def load_tutor_content() -> Dict[str, Any]:
+    """Load tutor content once per process, with lookup indexes and pre-rendered text"""
+    global _tutor_content
+    if _tutor_content is not None:
+        return _tutor_content
     
-    def __init__(self) -> None:
-        concepts_info = get_available_concepts()
-        
-        super().__init__(
-            instructions=f"""You are an interactive Teach-the-Tutor learning system with THREE learning modes.
+    concepts = _read_tutor_content()
+    id_index = {c["id"].casefold(): c for c in concepts}
+    title_index = {c["title"].casefold(): c for c in concepts}
+    listings = format_topic_listings(concepts)
+    content = {
+        "concepts": concepts,
+        "concept_index": {**title_index, **id_index},
+        "mode_responses": render_mode_responses(concepts),
+        "instructions": _TUTOR_INSTRUCTIONS_TEMPLATE % {"concepts_info": listings["available_concepts_str"]},
+        **listings,
+    }
+    # Don't cache a failed load, so later calls retry reading the file
+    if concepts:
+        _tutor_content = content
+    return content
+
+def find_concept(content: Dict[str, Any], topic: str) -> Dict[str, Any] | None:
+    """Get a concept by ID or title (IDs take precedence)"""
+    return content["concept_index"].get(topic.casefold())
+
+def get_mode_response(content: Dict[str, Any], concept: Dict[str, Any], mode: str) -> str:
+    """Get the pre-rendered response for switching into a mode on a concept"""
+    return content["mode_responses"][concept["id"]][mode]
+
+
+_TUTOR_INSTRUCTIONS_TEMPLATE = """You are an interactive Teach-the-Tutor learning system with THREE learning modes.
 
 AVAILABLE TOPICS:
-{concepts_info}
+%(concepts_info)s
 
 THREE LEARNING MODES:
 
@@ -116,14 +192,22 @@ IMPORTANT BEHAVIOR:
 - After switching, adopt that mode's personality and voice style
 - Users can switch modes anytime by asking
 
-CURRENT STATUS:
-- Mode: {session_state.get('current_mode', 'coordinator')}
-
 REMEMBER: 
 - Keep responses conversational for voice
 - One question or instruction at a time
-- Be encouraging and supportive""",
+- Be encouraging and supportive"""
+
+
+class UnifiedTutorAgent(Agent):
+    """Unified agent that handles all three modes with voice switching"""
+    
+    def __init__(self, content: Dict[str, Any]) -> None:
+        super().__init__(
+            instructions=content["instructions"],
         )
+        # Content bundle loaded once per job, so tools never touch the file
+        self.content = content
+        self.state = SessionState()
 
     @function_tool
     async def switch_to_learn(
@@ -137,23 +221,19 @@ REMEMBER:
             topic: The topic to teach (e.g., "variables", "loops", "functions")
         """
         # Try to find concept by ID or title
-        concept = get_concept_by_id(topic) or get_concept_by_title(topic)
+        concept = find_concept(self.content, topic)
         
         if not concept:
-            available = get_available_concepts()
+            available = self.content["available_concepts_str"]
             return f"I don't have that topic. {available}"
         
-        session_state["current_mode"] = "learn"
-        session_state["current_concept"] = concept
+        self.state.current_mode = "learn"
+        self.state.current_concept = concept
         
-        logger.info(f"Switched to LEARN mode for {concept['title']}")
+        logger.info("Switched to LEARN mode for %s", concept["title"])
         
         # Return the explanation
-        return f"""Let me teach you about {concept['title']}.
-
-{concept['summary']}
-
-Do you have any questions about this? Or would you like to hear more examples?"""
+        return get_mode_response(self.content, concept, "learn")
 
     @function_tool
     async def switch_to_quiz(
@@ -166,22 +246,18 @@ Do you have any questions about this? Or would you like to hear more examples?""
         Args:
             topic: The topic to quiz on (e.g., "variables", "loops", "functions")
         """
-        concept = get_concept_by_id(topic) or get_concept_by_title(topic)
+        concept = find_concept(self.content, topic)
         
         if not concept:
-            available = get_available_concepts()
+            available = self.content["available_concepts_str"]
             return f"I don't have that topic. {available}"
         
-        session_state["current_mode"] = "quiz"
-        session_state["current_concept"] = concept
+        self.state.current_mode = "quiz"
+        self.state.current_concept = concept
         
-        logger.info(f"Switched to QUIZ mode for {concept['title']}")
+        logger.info("Switched to QUIZ mode for %s", concept["title"])
         
-        return f"""Ready to test your knowledge on {concept['title']}?
-
-Here's your question: {concept['sample_question']}
-
-Take your time!"""
+        return get_mode_response(self.content, concept, "quiz")
 
     @function_tool
     async def switch_to_teachback(
@@ -194,20 +270,18 @@ Take your time!"""
         Args:
             topic: The topic for teach-back (e.g., "variables", "loops", "functions")
         """
-        concept = get_concept_by_id(topic) or get_concept_by_title(topic)
+        concept = find_concept(self.content, topic)
         
         if not concept:
-            available = get_available_concepts()
+            available = self.content["available_concepts_str"]
             return f"I don't have that topic. {available}"
         
-        session_state["current_mode"] = "teach_back"
-        session_state["current_concept"] = concept
+        self.state.current_mode = "teach_back"
+        self.state.current_concept = concept
         
-        logger.info(f"Switched to TEACH BACK mode for {concept['title']}")
+        logger.info("Switched to TEACH BACK mode for %s", concept["title"])
         
-        return f"""Excellent! Now it's your turn to be the teacher.
-
-Explain {concept['title']} to me as if I know nothing about it. Take your time and teach me everything you know!"""
+        return get_mode_response(self.content, concept, "teach_back")
 
     @function_tool
     async def provide_feedback(
@@ -224,10 +298,10 @@ Explain {concept['title']} to me as if I know nothing about it. Take your time a
             improvements: What they could improve or missed
             overall: Overall assessment (Excellent/Good/Needs Work)
         """
-        if session_state.get("current_mode") != "teach_back":
+        if self.state.current_mode != "teach_back":
             return "Feedback is only available in TEACH BACK mode"
         
-        concept = session_state.get("current_concept")
+        concept = self.state.current_concept
         concept_name = concept["title"] if concept else "this topic"
         
         feedback = f"""Overall Assessment: {overall}
@@ -245,16 +319,34 @@ Great effort! Teaching is one of the best ways to learn. Want to try another top
     @function_tool
     async def list_topics(self, context: RunContext):
         """List all available topics/concepts"""
-        concepts = session_state.get("concepts", [])
-        if not concepts:
-            return "No topics available"
-        
-        topics = "\n".join([f"• {c['title']} - {c['summary'][:50]}..." for c in concepts])
-        return f"Available topics:\n{topics}"
+        return self.content["topics_str"]
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    # Load the VAD model and tutor content (once per worker process, not per job)
+    # in parallel, since neither depends on the other
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        vad_future = pool.submit(silero.VAD.load)
+        content_future = pool.submit(load_tutor_content)
+        proc.userdata["vad"] = vad_future.result()
+        content = content_future.result()
+    
+    # The content stays in load_tutor_content's process cache for jobs to pick up
+    concepts = content["concepts"]
+    if not concepts:
+        logger.error("No concepts loaded! Check if content file exists.")
+    else:
+        logger.info("Successfully loaded %d concepts", len(concepts))
+
+
+def get_turn_detector(proc: JobProcess) -> MultilingualModel:
+    """Get the turn detector shared by all jobs in this worker process"""
+    # MultilingualModel needs a running job context for its inference executor,
+    # so it can't be built in prewarm - the first job creates it instead
+    turn_detector = proc.userdata.get("turn_detector")
+    if turn_detector is None:
+        turn_detector = proc.userdata["turn_detector"] = MultilingualModel()
+    return turn_detector
 
 
 async def entrypoint(ctx: JobContext):
@@ -262,57 +354,56 @@ async def entrypoint(ctx: JobContext):
         "room": ctx.room.name,
     }
 
-    # Load tutor content
-    session_state["concepts"] = load_tutor_content()
+    # Tutor content is cached once per process in prewarm; if it failed to load
+    # there, this retries the load once for the job, off the event loop
+    content = await asyncio.to_thread(load_tutor_content)
+    agent = UnifiedTutorAgent(content)
     
-    if not session_state["concepts"]:
-        logger.error("No concepts loaded! Check if content file exists.")
-    else:
-        logger.info(f"Successfully loaded {len(session_state['concepts'])} concepts")
+    # Pick the voice for the agent's starting mode (switching voices mid-session
+    # would need a real handoff implementation)
+    voice = MODE_VOICES[agent.state.current_mode]
 
-    # Default to coordinator mode with Matthew voice
-    voice = "en-US-matthew"
-    current_mode = session_state.get("current_mode", "coordinator")
-    
-    # Change voice based on mode (this would need voice switching in a real handoff implementation)
-    # For now, we'll use Matthew as default
-    if current_mode == "quiz":
-        voice = "en-US-alicia"
-    elif current_mode == "teach_back":
-        voice = "en-US-ken"
+    if USE_LIVEKIT_INFERENCE:
+        stt = inference.STT(model="deepgram/nova-3")
+        llm = inference.LLM(model="google/gemini-2.5-flash")
+    else:
+        stt = deepgram.STT(model="nova-3")
+        llm = google.LLM(model="gemini-2.5-flash")
 
     session = AgentSession(
-        stt=deepgram.STT(model="nova-3"),
-        llm=google.LLM(model="gemini-2.5-flash"),
+        stt=stt,
+        llm=llm,
+        # Murf voices aren't in the LiveKit Inference catalog, so TTS stays on the Murf plugin
         tts=murf.TTS(
             voice=voice, 
             style="Conversation",
-            tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
+            tokenizer=SENTENCE_TOKENIZER,
             text_pacing=True
         ),
-        turn_detection=MultilingualModel(),
+        turn_detection=get_turn_detector(ctx.proc),
         vad=ctx.proc.userdata["vad"],
         preemptive_generation=True,
     )
 
     usage_collector = metrics.UsageCollector()
+    metrics_log_tasks: set[asyncio.Task] = set()
 
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
-        metrics.log_metrics(ev.metrics)
         usage_collector.collect(ev.metrics)
+        # Log from a worker thread so the handler returns to the audio loop immediately
+        task = asyncio.create_task(asyncio.to_thread(metrics.log_metrics, ev.metrics))
+        metrics_log_tasks.add(task)
+        task.add_done_callback(metrics_log_tasks.discard)
 
     async def log_usage():
         summary = usage_collector.get_summary()
-        logger.info(f"Usage: {summary}")
+        logger.info("Usage: %s", summary)
 
     ctx.add_shutdown_callback(log_usage)
 
-    # Store session for potential handoffs
-    session_state["session"] = session
-
     await session.start(
-        agent=UnifiedTutorAgent(),
+        agent=agent,
         room=ctx.room,
         room_input_options=RoomInputOptions(
             noise_cancellation=noise_cancellation.BVC(),
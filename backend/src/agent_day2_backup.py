@@ -1,6 +1,8 @@
+import asyncio
 import logging
 import json
 import os
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
 
 from dotenv import load_dotenv
@@ -25,44 +27,86 @@ logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
 
-# Order state - tracks the current coffee order
-order_state = {
-    "drinkType": None,
-    "size": None,
-    "milk": None,
-    "extras": [],
-    "name": None
+# Stateless sentence splitter for TTS, shared by every session (each stream gets its own state).
+# A sentence is still only emitted once the next one starts; stream_context_len=1 just
+# stops the stream from buffering 10 characters before it first tries to split.
+SENTENCE_TOKENIZER = tokenize.basic.SentenceTokenizer(
+    min_sentence_len=1, stream_context_len=1
+)
+
+
+@dataclass
+class OrderState:
+    """Tracks the coffee order for a single session"""
+    drinkType: str | None = None
+    size: str | None = None
+    milk: str | None = None
+    extras: set = field(default_factory=set)
+    name: str | None = None
+
+# Required order fields and how to describe them when missing
+REQUIRED_FIELDS = (
+    ("drinkType", "drink type"),
+    ("size", "size"),
+    ("milk", "milk preference"),
+    ("name", "name for the order"),
+)
+
+# Accepted spellings of each order field, as passed to update_order
+_FIELD_MAP = {
+    "drinktype": "drinkType",
+    "drink_type": "drinkType",
+    "drink": "drinkType",
+    "size": "size",
+    "milk": "milk",
+    "extras": "extras",
+    "extra": "extras",
+    "name": "name",
+    "customer_name": "name"
 }
 
-def reset_order():
-    """Reset order state for a new order"""
-    global order_state
-    order_state = {
-        "drinkType": None,
-        "size": None,
-        "milk": None,
-        "extras": [],
-        "name": None
-    }
+# Replies that mean the customer doesn't want any extras
+_EXTRAS_NONE = frozenset({"none", "no", "nothing"})
+
+# Upper bound on extras per drink, so a long or adversarial session can't grow the order unboundedly
+MAX_EXTRAS = 16
+
+# Tool response templates, filled from the order's fields with str.format_map
+_SAVE_SUMMARY_FMT = """Order saved successfully!
+
+Order for: {name}
+Drink: {size} {drinkType}
+Milk: {milk}
+Extras: {extras_text}
+
+Order saved to {filename}"""
+
+_ORDER_STATUS_FMT = """Current order status:
+Drink: {drinkType}
+Size: {size}
+Milk: {milk}
+Extras: {extras_text}
+Name: {name}
 
-def get_missing_fields():
+Missing fields: {missing_text}"""
+
+def get_missing_fields(order: OrderState):
     """Get list of fields that still need to be filled"""
-    missing = []
-    if not order_state["drinkType"]:
-        missing.append("drink type")
-    if not order_state["size"]:
-        missing.append("size")
-    if not order_state["milk"]:
-        missing.append("milk preference")
-    if not order_state["name"]:
-        missing.append("name for the order")
-    return missing
+    return [label for key, label in REQUIRED_FIELDS if not getattr(order, key)]
 
+def _write_order(filename: str, order_data: dict):
+    """Write an order to disk (blocking - run off the event loop)"""
+    # Create orders directory if it doesn't exist
+    os.makedirs("orders", exist_ok=True)
+    
+    # json.dumps without indent takes the C encoder fast path; json.dump and
+    # indented output go through the pure-Python encoder
+    payload = json.dumps(order_data)
+    with open(filename, "w") as f:
+        f.write(payload)
 
-class CoffeeBarista(Agent):
-    def __init__(self) -> None:
-        super().__init__(
-            instructions="""You are a friendly and enthusiastic coffee shop barista at "Brew Haven Cafe". 
+
+_COFFEE_INSTRUCTIONS = """You are a friendly and enthusiastic coffee shop barista at "Brew Haven Cafe". 
             
 Your job is to take coffee orders from customers through voice conversation.
 
@@ -87,8 +131,20 @@ IMPORTANT:
 - Use the tools to update and save the order
 - Keep responses concise and natural for voice
 - Don't use emojis, asterisks, or special formatting
-- If customer says "no extras" or similar, that's fine - extras are optional""",
+- If customer says "no extras" or similar, that's fine - extras are optional"""
+
+
+class CoffeeBarista(Agent):
+    def __init__(self) -> None:
+        super().__init__(
+            instructions=_COFFEE_INSTRUCTIONS,
         )
+        # Each session gets its own order, so concurrent jobs in one worker don't interfere
+        self.order = OrderState()
+
+    def reset_order(self):
+        """Reset order state for a new order"""
+        self.order = OrderState()
 
     @function_tool
     async def update_order(
@@ -101,36 +157,27 @@ IMPORTANT:
         
         Args:
             field: The field to update. Must be one of: drinkType, size, milk, extras, name
-            value: The value to set for the field. For extras, this adds to the list.
+            value: The value to set for the field. For extras, this adds to the set of extras.
         """
-        global order_state
-        
         field = field.lower()
-        field_map = {
-            "drinktype": "drinkType",
-            "drink_type": "drinkType",
-            "drink": "drinkType",
-            "size": "size",
-            "milk": "milk",
-            "extras": "extras",
-            "extra": "extras",
-            "name": "name",
-            "customer_name": "name"
-        }
-        
-        actual_field = field_map.get(field, field)
+        actual_field = _FIELD_MAP.get(field, field)
         
         if actual_field == "extras":
-            if value.lower() not in ["none", "no", "nothing"]:
-                order_state["extras"].append(value)
-            logger.info(f"Added extra: {value}")
-        elif actual_field in order_state:
-            order_state[actual_field] = value
-            logger.info(f"Updated {actual_field}: {value}")
+            # Extras are normalized so repeating one doesn't add a duplicate
+            normalized = value.strip().lower()
+            if normalized not in _EXTRAS_NONE:
+                extras = self.order.extras
+                if normalized not in extras and len(extras) >= MAX_EXTRAS:
+                    return f"Cannot add more than {MAX_EXTRAS} extras to one order"
+                extras.add(normalized)
+            logger.info("Added extra: %s", normalized)
+        elif actual_field in OrderState.__dataclass_fields__:
+            setattr(self.order, actual_field, value)
+            logger.info("Updated %s: %s", actual_field, value)
         else:
             return f"Unknown field: {field}"
         
-        missing = get_missing_fields()
+        missing = get_missing_fields(self.order)
         if missing:
             return f"Order updated. Still need: {', '.join(missing)}"
         else:
@@ -139,62 +186,59 @@ IMPORTANT:
     @function_tool
     async def save_order(self, context: RunContext):
         """Save the completed order to a JSON file. Call this when all required fields are filled."""
-        global order_state
-        
-        missing = get_missing_fields()
+        order = self.order
+        missing = get_missing_fields(order)
         if missing:
             return f"Cannot save order yet. Still need: {', '.join(missing)}"
         
-        # Create orders directory if it doesn't exist
-        os.makedirs("orders", exist_ok=True)
+        # Tool calls from one LLM turn run concurrently, so start the next order
+        # before awaiting the write; other tools then can't change this order mid-save
+        self.reset_order()
         
         # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         filename = f"orders/order_{timestamp}.json"
         
         # Prepare order data
         order_data = {
-            "order": order_state.copy(),
-            "timestamp": datetime.now().isoformat(),
+            "order": {**asdict(order), "extras": sorted(order.extras)},
+            "timestamp": now.isoformat(),
             "status": "completed"
         }
         
-        # Save to JSON file
-        with open(filename, "w") as f:
-            json.dump(order_data, f, indent=2)
+        # Save to JSON file without blocking the audio pipeline
+        try:
+            await asyncio.to_thread(_write_order, filename, order_data)
+        except Exception as e:
+            logger.error("Error saving order to %s: %s", filename, e)
+            # Put the order back unless another tool already started a new one
+            if self.order == OrderState():
+                self.order = order
+            return "Sorry, I couldn't save your order right now. Please try again in a moment."
         
-        logger.info(f"Order saved to {filename}")
+        logger.info("Order saved to %s", filename)
         
         # Create order summary
-        extras_text = ", ".join(order_state["extras"]) if order_state["extras"] else "none"
-        summary = f"""Order saved successfully!
-        
-Order for: {order_state['name']}
-Drink: {order_state['size']} {order_state['drinkType']}
-Milk: {order_state['milk']}
-Extras: {extras_text}
-
-Order saved to {filename}"""
-        
-        # Reset for next order
-        reset_order()
+        extras_text = ", ".join(sorted(order.extras)) if order.extras else "none"
+        summary = _SAVE_SUMMARY_FMT.format_map(
+            {**vars(order), "extras_text": extras_text, "filename": filename}
+        )
         
         return summary
 
     @function_tool
     async def get_order_status(self, context: RunContext):
         """Get the current status of the order being taken."""
-        missing = get_missing_fields()
-        extras_text = ", ".join(order_state["extras"]) if order_state["extras"] else "none yet"
+        missing = get_missing_fields(self.order)
+        order = self.order
+        extras_text = ", ".join(sorted(order.extras)) if order.extras else "none yet"
         
-        status = f"""Current order status:
-Drink: {order_state['drinkType'] or 'not set'}
-Size: {order_state['size'] or 'not set'}
-Milk: {order_state['milk'] or 'not set'}
-Extras: {extras_text}
-Name: {order_state['name'] or 'not set'}
-
-Missing fields: {', '.join(missing) if missing else 'None - order ready to save!'}"""
+        status = _ORDER_STATUS_FMT.format_map({
+            **{key: value or "not set" for key, value in vars(order).items()},
+            "extras_text": extras_text,
+            "missing_text": ", ".join(missing) if missing else "None - order ready to save!",
+        })
         
         return status
 
@@ -203,6 +247,16 @@ def prewarm(proc: JobProcess):
     proc.userdata["vad"] = silero.VAD.load()
 
 
+def get_turn_detector(proc: JobProcess) -> MultilingualModel:
+    """Get the turn detector shared by all jobs in this worker process"""
+    # MultilingualModel needs a running job context for its inference executor,
+    # so it can't be built in prewarm - the first job creates it instead
+    turn_detector = proc.userdata.get("turn_detector")
+    if turn_detector is None:
+        turn_detector = proc.userdata["turn_detector"] = MultilingualModel()
+    return turn_detector
+
+
 async def entrypoint(ctx: JobContext):
     ctx.log_context_fields = {
         "room": ctx.room.name,
@@ -214,24 +268,28 @@ async def entrypoint(ctx: JobContext):
         tts=murf.TTS(
             voice="en-US-matthew", 
             style="Conversation",
-            tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
+            tokenizer=SENTENCE_TOKENIZER,
             text_pacing=True
         ),
-        turn_detection=MultilingualModel(),
+        turn_detection=get_turn_detector(ctx.proc),
         vad=ctx.proc.userdata["vad"],
         preemptive_generation=True,
     )
 
     usage_collector = metrics.UsageCollector()
+    metrics_log_tasks: set[asyncio.Task] = set()
 
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
-        metrics.log_metrics(ev.metrics)
         usage_collector.collect(ev.metrics)
+        # Log from a worker thread so the handler returns to the audio loop immediately
+        task = asyncio.create_task(asyncio.to_thread(metrics.log_metrics, ev.metrics))
+        metrics_log_tasks.add(task)
+        task.add_done_callback(metrics_log_tasks.discard)
 
     async def log_usage():
         summary = usage_collector.get_summary()
-        logger.info(f"Usage: {summary}")
+        logger.info("Usage: %s", summary)
 
     ctx.add_shutdown_callback(log_usage)
 
@@ -0,0 +1,69 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+
+_ARCHIVE = Path(__file__).resolve().parents[1] / "archive" / "agent_day3_backup.py"
+_spec = importlib.util.spec_from_file_location("agent_day3_backup", _ARCHIVE)
+wellness = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(wellness)
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    path = tmp_path / "wellness_log.jsonl"
+    monkeypatch.setattr(wellness, "WELLNESS_LOG_FILE", str(path))
+    return path
+
+
+def _write(path: Path, lines: list[str]) -> None:
+    path.write_text("".join(line + "\n" for line in lines))
+
+
+def _entries(count: int) -> list[str]:
+    return [json.dumps({"mood": f"mood-{i}", "note": "x" * 40}) for i in range(count)]
+
+
+def test_missing_file_returns_empty(log_file) -> None:
+    assert wellness.load_last_n(3) == []
+
+
+def test_n_larger_than_file(log_file) -> None:
+    _write(log_file, _entries(2))
+    assert [e["mood"] for e in wellness.load_last_n(10)] == ["mood-0", "mood-1"]
+
+
+def test_block_boundary_inside_record(log_file, monkeypatch) -> None:
+    # Blocks smaller than a record force reads to split records mid-line
+    monkeypatch.setattr(wellness, "TAIL_READ_SIZE", 7)
+    _write(log_file, _entries(5))
+    assert [e["mood"] for e in wellness.load_last_n(3)] == ["mood-2", "mood-3", "mood-4"]
+
+
+def test_blank_lines_are_ignored(log_file, monkeypatch) -> None:
+    monkeypatch.setattr(wellness, "TAIL_READ_SIZE", 16)
+    lines = _entries(3)
+    _write(log_file, [lines[0], "", lines[1], "", "", lines[2], ""])
+    assert [e["mood"] for e in wellness.load_last_n(2)] == ["mood-1", "mood-2"]
+
+
+def test_corrupt_line_is_skipped(log_file) -> None:
+    lines = _entries(3)
+    _write(log_file, [lines[0], '{"mood": "trunc', lines[2]])
+    assert [e["mood"] for e in wellness.load_last_n(3)] == ["mood-0", "mood-2"]
+
+
+def test_corrupt_last_line_does_not_hide_previous_record(log_file, monkeypatch) -> None:
+    monkeypatch.setattr(wellness, "TAIL_READ_SIZE", 16)
+    lines = _entries(3)
+    log_file.write_text("\n".join(lines) + '\n{"mood": "torn')
+    assert [e["mood"] for e in wellness.load_last_n(1)] == ["mood-2"]
+    assert wellness.get_last_checkin()["mood"] == "mood-2"
+    assert [e["mood"] for e in wellness.load_last_n(5)] == ["mood-0", "mood-1", "mood-2"]
+
+
+def test_append_after_torn_line_starts_new_line(log_file) -> None:
+    log_file.write_text(_entries(1)[0] + '\n{"mood": "torn')
+    wellness.save_wellness_entry({"mood": "three", "timestamp": "t"})
+    assert [e["mood"] for e in wellness.load_last_n(5)] == ["mood-0", "three"]